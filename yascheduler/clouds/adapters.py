@@ -1,41 +1,49 @@
 """Cloud adapters"""
 
 import asyncio
-from functools import lru_cache
-from typing import Sequence, Tuple
+from typing import Optional, Sequence, Tuple
+from weakref import WeakKeyDictionary
 
 from attrs import define, field
 
-from .az import az_create_node, az_delete_node
+from .az import az_close, az_create_node, az_delete_node
 from .hetzner import hetzner_create_node, hetzner_delete_node
 from .protocols import (
+    CloseCallable,
     CreateNodeCallable,
     DeleteNodeCallable,
     PCloudAdapter,
     SupportedPlatformChecker,
     TConfigCloud_contra,
 )
+from .upcloud import OP_LIMIT as UPCLOUD_OP_LIMIT
 from .upcloud import upcload_delete_node, upcloud_create_node
 
 
+DEBIAN_BUSTER_PLATFORMS = frozenset(("debian-10", "debian", "debian-like", "linux"))
+DEBIAN_BULLSEYE_PLATFORMS = frozenset(("debian-11", "debian", "debian-like", "linux"))
+WIN10_PLATFORMS = frozenset(("windows-10", "windows"))
+WIN11_PLATFORMS = frozenset(("windows-11", "windows"))
+
+
 def can_debian_buster(platform: str) -> bool:
     "Platform is compatible with Debian Buster"
-    return platform in ["debian-10", "debian", "debian-like", "linux"]
+    return platform in DEBIAN_BUSTER_PLATFORMS
 
 
 def can_debian_bullseye(platform: str) -> bool:
     "Platform is compatible with Debian Bullseye"
-    return platform in ["debian-11", "debian", "debian-like", "linux"]
+    return platform in DEBIAN_BULLSEYE_PLATFORMS
 
 
 def can_win10(platform: str) -> bool:
     "Platform is compatible with Windows 10"
-    return platform in ["windows-10", "windows"]
+    return platform in WIN10_PLATFORMS
 
 
 def can_win11(platform: str) -> bool:
     "Platform is compatible with Windows 11"
-    return platform in ["windows-11", "windows"]
+    return platform in WIN11_PLATFORMS
 
 
 @define(frozen=True)
@@ -43,12 +51,17 @@ class CloudAdapter(PCloudAdapter[TConfigCloud_contra]):
     """Cloud adapter"""
 
     name: str = field()
-    supported_platform_checks: Tuple[SupportedPlatformChecker] = field()
+    supported_platform_checks: Tuple[SupportedPlatformChecker, ...] = field()
     create_node: CreateNodeCallable[TConfigCloud_contra] = field()
     create_node_conn_timeout: int = field()
     create_node_timeout: int = field()
     delete_node: DeleteNodeCallable[TConfigCloud_contra] = field()
     op_limit: int = field(default=1)
+    close: Optional[CloseCallable[TConfigCloud_contra]] = field(default=None)
+    # event loop -> op semaphore
+    _op_semaphores: WeakKeyDictionary = field(
+        init=False, factory=WeakKeyDictionary, eq=False, repr=False
+    )
 
     @classmethod
     def create(
@@ -60,6 +73,7 @@ class CloudAdapter(PCloudAdapter[TConfigCloud_contra]):
         create_node_conn_timeout: int = 10,
         create_node_timeout: int = 300,
         op_limit: int = 1,
+        close: Optional[CloseCallable[TConfigCloud_contra]] = None,
     ):
         return cls(
             name=name,
@@ -69,11 +83,16 @@ class CloudAdapter(PCloudAdapter[TConfigCloud_contra]):
             create_node_timeout=create_node_timeout,
             delete_node=delete_node,
             op_limit=op_limit,
+            close=close,
         )
 
-    @lru_cache  # noqa: B019
     def get_op_semaphore(self) -> asyncio.Semaphore:
-        return asyncio.Semaphore(self.op_limit)
+        # one per running loop, so a restarted loop doesn't get a stale one
+        loop = asyncio.get_running_loop()
+        semaphore = self._op_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._op_semaphores[loop] = asyncio.Semaphore(self.op_limit)
+        return semaphore
 
 
 azure_adapter = CloudAdapter.create(
@@ -82,6 +101,7 @@ azure_adapter = CloudAdapter.create(
     create_node=az_create_node,
     delete_node=az_delete_node,
     op_limit=5,
+    close=az_close,
 )
 hetzner_adapter = CloudAdapter.create(
     name="hetzner",
@@ -95,5 +115,5 @@ upcloud_adapter = CloudAdapter.create(
     supported_platform_checks=[can_debian_buster],
     create_node=upcloud_create_node,
     delete_node=upcload_delete_node,
-    op_limit=1,
+    op_limit=UPCLOUD_OP_LIMIT,
 )
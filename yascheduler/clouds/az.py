@@ -1,11 +1,14 @@
 """Azure cloud methods"""
 
+import asyncio
 import logging
+from functools import lru_cache
 from pathlib import PurePosixPath
 from typing import Dict, Optional, Tuple, cast
 
+import aiohttp
 from asyncssh.public_key import SSHKey
-from attrs import asdict, evolve
+from attrs import asdict, define, evolve, field
 from azure.core.credentials_async import AsyncTokenCredential
 from azure.core.exceptions import (
     AzureError,
@@ -14,6 +17,7 @@ from azure.core.exceptions import (
     ServiceResponseError,
     ServiceResponseTimeoutError,
 )
+from azure.core.pipeline.transport import AioHttpTransport
 from azure.identity.aio import ClientSecretCredential
 from azure.mgmt.compute.v2021_07_01.aio import ComputeManagementClient
 from azure.mgmt.compute.v2021_07_01.models import (
@@ -39,10 +43,11 @@ from azure.mgmt.network.v2020_06_01.models import (
     NetworkInterfaceIPConfiguration,
     TagsObject,
 )
+from azure.mgmt.resource.resources.v2021_04_01.aio import ResourceManagementClient
 
 from ..config.cloud import AzureImageReference, ConfigCloudAzure
 from .protocols import PCloudConfig
-from .utils import get_rnd_name
+from .utils import get_public_key, get_rnd_name
 
 # Azure SDK is too noisy
 for logger_name in [
@@ -54,6 +59,8 @@ for logger_name in [
 
 
 ID_TAG_NAME = "yascheduler_ip"
+VM_RESOURCE_TYPE = "microsoft.compute/virtualmachines"
+NIC_RESOURCE_TYPE = "microsoft.network/networkinterfaces"
 
 RETRY_AZURE_ERRORS = (
     ServiceResponseError,
@@ -63,6 +70,68 @@ RETRY_AZURE_ERRORS = (
 )
 ALL_AZURE_ERRORS = (AzureError,)
 
+# Polling interval (seconds) for long-running operations that usually finish
+# in seconds (NIC, power-off, delete). The SDK default follows Retry-After,
+# which is often 30s or more. Keep it modest: every poll is an ARM read,
+# and reads are throttled per subscription.
+FAST_POLLING_INTERVAL = 5
+
+
+@define(frozen=True)
+class AzureClients:
+    "Azure SDK clients, shared by all operations on the same cloud config"
+    cred: ClientSecretCredential = field()
+    session: aiohttp.ClientSession = field()
+    nmc: NetworkManagementClient = field()
+    cmc: ComputeManagementClient = field()
+    rmc: ResourceManagementClient = field()
+
+    @classmethod
+    def create(cls, cfg: ConfigCloudAzure) -> "AzureClients":
+        "Create clients; connections are opened lazily on the first request"
+        cred = ClientSecretCredential(cfg.tenant_id, cfg.client_id, cfg.client_secret)
+        acred = cast(AsyncTokenCredential, cred)  # fix library type errors
+        # One connection pool for all clients, sized for concurrent node ops.
+        # The default per-client pool serializes requests under a burst.
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=cfg.max_nodes * 4,
+                limit_per_host=cfg.max_nodes * 4,
+                ttl_dns_cache=300,
+            )
+        )
+        opts = {
+            "credential": acred,
+            "subscription_id": cfg.subscription_id,
+            "transport": AioHttpTransport(session=session, session_owner=False),
+        }
+        return cls(
+            cred=cred,
+            session=session,
+            nmc=NetworkManagementClient(**opts),
+            cmc=ComputeManagementClient(**opts),
+            rmc=ResourceManagementClient(**opts),
+        )
+
+    async def close(self) -> None:
+        "Close clients, shared connection pool and credential"
+        await self.rmc.close()
+        await self.cmc.close()
+        await self.nmc.close()
+        await self.session.close()
+        await self.cred.close()
+
+
+_clients: Dict[ConfigCloudAzure, AzureClients] = {}
+
+
+def get_clients(cfg: ConfigCloudAzure) -> AzureClients:
+    "Get Azure clients (cached)"
+    clients = _clients.get(cfg)
+    if not clients:
+        clients = _clients[cfg] = AzureClients.create(cfg)
+    return clients
+
 
 async def create_nic(
     log: logging.Logger,
@@ -73,13 +142,15 @@ async def create_nic(
     "Create network interface"
     nic_name = f"{vm_name}-nic"
     ip_config_name = f"{nic_name}-ip-config"
-    subnet = await client.subnets.get(
-        resource_group_name=cfg.resource_group,
-        virtual_network_name=cfg.vnet,
-        subnet_name=cfg.subnet,
+    subnet, nsg = await asyncio.gather(
+        client.subnets.get(
+            resource_group_name=cfg.resource_group,
+            virtual_network_name=cfg.vnet,
+            subnet_name=cfg.subnet,
+        ),
+        client.network_security_groups.get(cfg.resource_group, cfg.nsg),
     )
     log.debug(f"Subnet {subnet.name} found")
-    nsg = await client.network_security_groups.get(cfg.resource_group, cfg.nsg)
     log.debug(f"Network security group {nsg.name} found")
     nic_ip_config_params = NetworkInterfaceIPConfiguration(
         name=ip_config_name,
@@ -96,6 +167,7 @@ async def create_nic(
         resource_group_name=cfg.resource_group,
         network_interface_name=nic_name,
         parameters=nic_params,
+        polling_interval=FAST_POLLING_INTERVAL,
     )
     await poller.wait()
     nic = await poller.result()
@@ -106,12 +178,52 @@ async def create_nic(
             ip_addr = ip_conf.private_ip_address
     if not ip_addr:
         raise RuntimeError("Azure VM created but no IP is assigned")
+    return nic, ip_addr
+
+
+async def tag_nic(
+    cfg: ConfigCloudAzure,
+    client: NetworkManagementClient,
+    nic: NetworkInterface,
+    ip_addr: str,
+) -> None:
+    "Tag network interface with its IP address"
     await client.network_interfaces.update_tags(
         cfg.resource_group,
         cast(str, nic.name),
         parameters=TagsObject(tags={ID_TAG_NAME: ip_addr}),
     )
-    return nic, ip_addr
+
+
+async def create_vm(
+    cfg: ConfigCloudAzure,
+    client: ComputeManagementClient,
+    vm_name: str,
+    vm_params: VirtualMachine,
+) -> VirtualMachine:
+    "Create virtual machine and wait for it"
+    poller = await client.virtual_machines.begin_create_or_update(
+        resource_group_name=cfg.resource_group,
+        vm_name=vm_name,
+        parameters=vm_params,
+    )
+    await poller.wait()
+    return await poller.result()
+
+
+@lru_cache(maxsize=None)
+def get_image_reference(vm_image: AzureImageReference) -> ImageReference:
+    """Image reference model (cached, it's the same for all VMs of a cloud)"""
+    return ImageReference.from_dict(asdict(vm_image))
+
+
+@lru_cache(maxsize=None)
+def get_ssh_public_key(username: str, ssh_key: SSHKey) -> SshPublicKey:
+    """Authorized SSH key model (cached, it's the same for all VMs of a cloud)"""
+    return SshPublicKey(
+        path=str(PurePosixPath("/home", username, ".ssh/authorized_keys")),
+        key_data=get_public_key(ssh_key),
+    )
 
 
 def create_vm_params(
@@ -126,11 +238,8 @@ def create_vm_params(
     cloud_config: Optional[PCloudConfig] = None,
 ) -> VirtualMachine:
     """Create VirtualMachine params"""
-    img_ref = ImageReference.from_dict(asdict(vm_image))
-    pub_key = SshPublicKey(
-        path=str(PurePosixPath("/home", username, ".ssh/authorized_keys")),
-        key_data=ssh_key.export_public_key("openssh").decode("utf-8"),
-    )
+    img_ref = get_image_reference(vm_image)
+    pub_key = get_ssh_public_key(username, ssh_key)
     custom_data = None
     if cloud_config:
         my_boot_cmds = [
@@ -191,17 +300,57 @@ async def create_node(
         cloud_config=cloud_config,
     )
 
-    poller = await cmc.virtual_machines.begin_create_or_update(
-        resource_group_name=cfg.resource_group,
-        vm_name=get_rnd_name("yascheduler-vm"),
-        parameters=vm_params,
+    # The NIC tag is only needed on delete, so don't hold the VM create on it.
+    # Let both finish before looking at errors: nothing is left in flight
+    # when we clean up.
+    tag_res, vm_res = await asyncio.gather(
+        tag_nic(cfg=cfg, client=nmc, nic=nic, ip_addr=ip_addr),
+        create_vm(
+            cfg=cfg,
+            client=cmc,
+            vm_name=vm_name,
+            vm_params=vm_params,
+        ),
+        return_exceptions=True,
     )
-    await poller.wait()
-    vm_res = await poller.result()
-    log.debug(f"VM {vm_res.name} created")
+    for res in (vm_res, tag_res):
+        if isinstance(res, BaseException):
+            log.warning(f"VM {vm_name} creation failed - cleaning up")
+            await cleanup_node(
+                nmc=nmc, cmc=cmc, log=log, cfg=cfg, vm_name=vm_name, nic=nic
+            )
+            raise res
+    log.debug(f"VM {vm_name} created")
     return ip_addr
 
 
+async def cleanup_node(
+    nmc: NetworkManagementClient,
+    cmc: ComputeManagementClient,
+    log: logging.Logger,
+    cfg: ConfigCloudAzure,
+    vm_name: str,
+    nic: NetworkInterface,
+) -> None:
+    """Delete what a failed node creation may have left"""
+    try:
+        # deleting a missing VM is a no-op for ARM
+        poller = await cmc.virtual_machines.begin_delete(
+            cfg.resource_group,
+            vm_name,
+            polling_interval=FAST_POLLING_INTERVAL,
+        )
+        await poller.wait()
+        poller = await nmc.network_interfaces.begin_delete(
+            cfg.resource_group,
+            cast(str, nic.name),
+            polling_interval=FAST_POLLING_INTERVAL,
+        )
+        await poller.wait()
+    except ALL_AZURE_ERRORS as err:
+        log.error(f"Cleanup of VM {vm_name} failed: {err}")
+
+
 async def az_create_node(
     log: logging.Logger,
     cfg: ConfigCloudAzure,
@@ -209,50 +358,66 @@ async def az_create_node(
     cloud_config: Optional[PCloudConfig] = None,
 ) -> str:
     """Create virtual machine with network interface"""
-    async with ClientSecretCredential(
-        cfg.tenant_id, cfg.client_id, cfg.client_secret
-    ) as cred:
-        cred = cast(AsyncTokenCredential, cred)  # fix library type errors
-        async with NetworkManagementClient(cred, cfg.subscription_id) as nmc:
-            async with ComputeManagementClient(cred, cfg.subscription_id) as cmc:
-                return await create_node(nmc, cmc, log, cfg, key, cloud_config)
+    clients = get_clients(cfg)
+    return await create_node(clients.nmc, clients.cmc, log, cfg, key, cloud_config)
+
+
+async def find_tagged(
+    cfg: ConfigCloudAzure,
+    client: ResourceManagementClient,
+    host: str,
+) -> Tuple[Optional[str], Optional[str]]:
+    """Find names of the VM and the network interface tagged with IP address"""
+    vm_name, nic_name = None, None
+    tag_filter = f"tagName eq '{ID_TAG_NAME}' and tagValue eq '{host}'"
+    async for res in client.resources.list_by_resource_group(
+        cfg.resource_group, filter=tag_filter
+    ):
+        res_type = (res.type or "").lower()
+        if res_type == VM_RESOURCE_TYPE:
+            vm_name = res.name
+        elif res_type == NIC_RESOURCE_TYPE:
+            nic_name = res.name
+    return vm_name, nic_name
 
 
 async def delete_node(
     nmc: NetworkManagementClient,
     cmc: ComputeManagementClient,
+    rmc: ResourceManagementClient,
     log: logging.Logger,
     cfg: ConfigCloudAzure,
     host: str,
 ):
     """Delete virtual machine with network interface"""
-    async for result in cmc.virtual_machines.list(cfg.resource_group):
-        vm_res = cast(VirtualMachine, result)
-        tag_ip = (vm_res.tags or {}).get(ID_TAG_NAME)
-        if tag_ip == host:
-            poller = await cmc.virtual_machines.begin_power_off(
-                cfg.resource_group, cast(str, vm_res.name)
-            )
-            await poller.wait()
+    # filter by tag on the server side instead of listing the whole group
+    vm_name, nic_name = await find_tagged(cfg=cfg, client=rmc, host=host)
 
-            poller = await cmc.virtual_machines.begin_delete(
-                cfg.resource_group, cast(str, vm_res.name)
-            )
-            await poller.wait()
-            log.debug(f"VM {vm_res.name} deleted")
-            break
-
-    nic = None
-    async for result in nmc.network_interfaces.list(cfg.resource_group):
-        nic = cast(NetworkInterface, result)
-        tag_ip = (nic.tags or {}).get(ID_TAG_NAME)
-        if tag_ip == host:
-            poller = await nmc.network_interfaces.begin_delete(
-                cfg.resource_group, cast(str, nic.name)
-            )
-            await poller.wait()
-            log.debug(f"Network interface {nic.name} deleted")
-            break
+    # the NIC can go only after its VM
+    if vm_name:
+        poller = await cmc.virtual_machines.begin_power_off(
+            cfg.resource_group,
+            vm_name,
+            polling_interval=FAST_POLLING_INTERVAL,
+        )
+        await poller.wait()
+
+        poller = await cmc.virtual_machines.begin_delete(
+            cfg.resource_group,
+            vm_name,
+            polling_interval=FAST_POLLING_INTERVAL,
+        )
+        await poller.wait()
+        log.debug(f"VM {vm_name} deleted")
+
+    if nic_name:
+        poller = await nmc.network_interfaces.begin_delete(
+            cfg.resource_group,
+            nic_name,
+            polling_interval=FAST_POLLING_INTERVAL,
+        )
+        await poller.wait()
+        log.debug(f"Network interface {nic_name} deleted")
 
 
 async def az_delete_node(
@@ -261,10 +426,13 @@ async def az_delete_node(
     host: str,
 ) -> None:
     """Delete virtual machine with network interface"""
-    async with ClientSecretCredential(
-        cfg.tenant_id, cfg.client_id, cfg.client_secret
-    ) as cred:
-        cred = cast(AsyncTokenCredential, cred)  # fix library type errors
-        async with NetworkManagementClient(cred, cfg.subscription_id) as nmc:
-            async with ComputeManagementClient(cred, cfg.subscription_id) as cmc:
-                return await delete_node(nmc, cmc, log, cfg, host)
+    clients = get_clients(cfg)
+    return await delete_node(clients.nmc, clients.cmc, clients.rmc, log, cfg, host)
+
+
+async def az_close(log: logging.Logger, cfg: ConfigCloudAzure) -> None:
+    """Close cached Azure clients"""
+    clients = _clients.pop(cfg, None)
+    if clients:
+        await clients.close()
+        log.debug("Azure clients closed")
@@ -4,7 +4,10 @@ import asyncio
 import base64
 import json
 import logging
-from typing import Optional, Sequence, Union
+import os
+from functools import lru_cache
+from pathlib import PurePath
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Tuple, Union
 
 import backoff
 from asyncssh.process import ProcessError
@@ -17,6 +20,9 @@ from .protocols import PCloudAdapter, PCloudAPI, PCloudConfig, TConfigCloud_cont
 from .utils import get_rnd_name
 
 
+KEY_PREFIX = "yakey"
+
+
 class CloudCreateNodeError(Exception):
     """Cloud node allocation error"""
 
@@ -25,23 +31,34 @@ class CloudSetupNodeError(Exception):
     """Cloud node setup error"""
 
 
+def _freeze_cmds(
+    cmds: Sequence[Union[str, Sequence[str]]]
+) -> Tuple[Union[str, Tuple[str, ...]], ...]:
+    return tuple(x if isinstance(x, str) else tuple(x) for x in cmds)
+
+
 @define(frozen=True)
 class CloudConfig(PCloudConfig):
     "Cloud config init"
-    bootcmd: Sequence[Union[str, Sequence[str]]] = field(factory=tuple)
+    # immutable collections keep the instance hashable for the render cache
+    bootcmd: Sequence[Union[str, Sequence[str]]] = field(
+        factory=tuple, converter=_freeze_cmds
+    )
     package_upgrade: bool = field(default=False)
-    packages: Sequence[str] = field(factory=list)
+    packages: Sequence[str] = field(factory=tuple, converter=tuple)
 
+    @lru_cache  # noqa: B019
     def render(self) -> str:
         "Render to user-data format"
         return "#cloud-config\n" + json.dumps(asdict(self))
 
+    @lru_cache  # noqa: B019
     def render_base64(self) -> str:
         "Render to user-data format as base64 string"
         return base64.b64encode(self.render().encode()).decode()
 
 
-@define(frozen=True)
+@define
 class CloudAPI(PCloudAPI[TConfigCloud_contra]):
     "Cloud API protocol"
     adapter: PCloudAdapter[TConfigCloud_contra] = field()
@@ -51,6 +68,33 @@ class CloudAPI(PCloudAPI[TConfigCloud_contra]):
     engines: EngineRepository = field()
     log: logging.Logger = field()
     ssh_key_lock: asyncio.Lock = field(factory=asyncio.Lock)
+    _platform_support: Dict[str, bool] = field(init=False, factory=dict)
+    _cloud_config: PCloudConfig = field(init=False)
+    _private_keys: Optional[Sequence[PurePath]] = field(init=False, default=None)
+    _ssh_key: Optional[SSHKey] = field(init=False, default=None)
+    _create_machine: Callable[..., Awaitable[PRemoteMachine]] = field(init=False)
+
+    @_cloud_config.default
+    def _make_cloud_config(self) -> PCloudConfig:
+        "Common cloud-config (engines and adapter are immutable, so build once)"
+        supported = self.is_platform_supported
+        engines = self.engines.filter(
+            lambda e: not e.platforms or any(supported(x) for x in e.platforms)
+        )
+        pkgs = engines.get_platform_packages()
+        return CloudConfig(package_upgrade=True, packages=pkgs)
+
+    @_create_machine.default
+    def _make_create_machine(self) -> Callable[..., Awaitable[PRemoteMachine]]:
+        "RemoteMachine.create, retried until the node accepts SSH connections"
+        retry = backoff.on_exception(
+            wait_gen=backoff.expo,
+            max_value=30,
+            jitter=backoff.full_jitter,
+            max_time=self.adapter.create_node_timeout,
+            exception=SSHRetryExc,
+        )
+        return retry(RemoteMachine.create)
 
     @property
     def name(self) -> str:
@@ -88,62 +132,89 @@ class CloudAPI(PCloudAPI[TConfigCloud_contra]):
         return self.adapter.get_op_semaphore()
 
     def is_platform_supported(self, platform: str) -> bool:
-        return any(map(lambda x: x(platform), self.adapter.supported_platform_checks))
-
-    def get_ssh_key_sync(self) -> SSHKey:
-        "Load or generate new SSHKey"
-        prefix = "yakey"
-        # try to load
-        for filepath in self.local_config.keys_dir.iterdir():
-            if not filepath.name.startswith(prefix) or not filepath.is_file():
-                continue
-            ssh_key = read_private_key(filepath)
-            ssh_key.set_comment(filepath.name)
-            self.log.debug(
-                "LOADED KEY %s: %s", filepath.name, ssh_key.get_fingerprint("md5")
+        supported = self._platform_support.get(platform)
+        if supported is None:
+            supported = any(
+                check(platform) for check in self.adapter.supported_platform_checks
             )
-            return ssh_key
+            self._platform_support[platform] = supported
+        return supported
 
-        key_name = get_rnd_name(prefix)
+    def load_ssh_key_sync(self) -> Optional[SSHKey]:
+        "Load existing SSHKey"
+        # DirEntry.is_file() uses the cached d_type, no extra stat
+        with os.scandir(self.local_config.keys_dir) as entries:
+            for entry in entries:
+                if not entry.name.startswith(KEY_PREFIX) or not entry.is_file():
+                    continue
+                ssh_key = read_private_key(entry.path)
+                ssh_key.set_comment(entry.name)
+                self.log.debug(
+                    "LOADED KEY %s: %s", entry.name, ssh_key.get_fingerprint("md5")
+                )
+                return ssh_key
+        return None
+
+    def generate_ssh_key_sync(self) -> SSHKey:
+        "Generate new SSHKey in memory"
+        return generate_private_key(
+            alg_name="ssh-ed25519", comment=get_rnd_name(KEY_PREFIX)
+        )
+
+    def write_ssh_key_sync(self, ssh_key: SSHKey) -> None:
+        "Persist SSHKey to the keys directory"
+        key_name = ssh_key.get_comment()
         filepath = self.local_config.keys_dir / key_name
-        ssh_key = generate_private_key(alg_name="ssh-rsa", comment=key_name)
         ssh_key.write_private_key(filepath)
         filepath.chmod(0o600)
-        ssh_key.set_comment(key_name)
         self.log.info("WRITTEN KEY %s: %s", key_name, ssh_key.get_fingerprint("md5"))
-        return ssh_key
 
     async def get_ssh_key(self) -> SSHKey:
         "Load or generate ssh key (cached)"
+        if self._ssh_key is not None:
+            return self._ssh_key
+        loop = asyncio.get_running_loop()
+        # the lock is shared by all clouds, so the key must be on disk
+        # before it is released, otherwise another cloud would generate its own
         async with self.ssh_key_lock:
-            return await asyncio.get_running_loop().run_in_executor(
-                None, self.get_ssh_key_sync
-            )
+            if self._ssh_key is None:
+                ssh_key = await loop.run_in_executor(None, self.load_ssh_key_sync)
+                if ssh_key is None:
+                    ssh_key = await loop.run_in_executor(
+                        None, self.generate_ssh_key_sync
+                    )
+                    # callers of this cloud may proceed while the key is written
+                    self._ssh_key = ssh_key
+                    try:
+                        await loop.run_in_executor(
+                            None, self.write_ssh_key_sync, ssh_key
+                        )
+                    except Exception:
+                        self._ssh_key = None
+                        raise
+                self._ssh_key = ssh_key
+            return self._ssh_key
 
     async def get_cloud_config_data(self) -> PCloudConfig:
         "Common cloud-config"
-        engines = self.engines.filter(
-            lambda e: bool(e.platforms)
-            and any(map(self.is_platform_supported, e.platforms))
-            or not e.platforms
-        )
-        pkgs = engines.get_platform_packages()
-        return CloudConfig(package_upgrade=True, packages=pkgs)
+        return self._cloud_config
 
     async def mk_machine(self, ip_addr: str) -> PRemoteMachine:
         "Create RemoteMachine"
-        keys = await asyncio.get_running_loop().run_in_executor(
-            None, self.local_config.get_private_keys
-        )
-        retry = backoff.on_exception(
-            wait_gen=backoff.fibo,
-            max_time=self.adapter.create_node_timeout,
-            exception=SSHRetryExc,
-        )
-        return await retry(RemoteMachine.create)(
+        if self._private_keys is None:
+            # lazy, because the cloud's own key is created on the first node;
+            # the ssh key lock is held until that key is written
+            async with self.ssh_key_lock:
+                if self._private_keys is None:
+                    self._private_keys = (
+                        await asyncio.get_running_loop().run_in_executor(
+                            None, self.local_config.get_private_keys
+                        )
+                    )
+        return await self._create_machine(
             host=ip_addr,
             username=self.config.username,
-            client_keys=keys,
+            client_keys=self._private_keys,
             logger=self.log,
             connect_timeout=self.adapter.create_node_conn_timeout,
             data_dir=self.remote_config.data_dir,
@@ -153,15 +224,43 @@ class CloudAPI(PCloudAPI[TConfigCloud_contra]):
             jump_username=self.config.jump_username,
         )
 
+    async def _create_cloud_node(self) -> str:
+        "Create node in the cloud; if cancelled, delete it once it is created"
+        creating = asyncio.ensure_future(
+            self.adapter.create_node(
+                log=self.log,
+                cfg=self.config,
+                key=await self.get_ssh_key(),
+                cloud_config=await self.get_cloud_config_data(),
+            )
+        )
+        try:
+            # the provider call is not cancelled: the node may get created
+            # anyway, and then nobody would know its address to delete it
+            return await asyncio.shield(creating)
+        except asyncio.CancelledError:
+            self.log.warning("Create node cancelled - deallocate once created")
+            await self._delete_created_node(creating)
+            raise
+
+    async def _delete_created_node(self, creating: "asyncio.Future[str]") -> None:
+        "Wait for the node creation to finish and delete the node"
+        try:
+            ip_addr = await asyncio.shield(creating)
+        except asyncio.CancelledError:
+            self.log.error("Create node abandoned - the node may be left running")
+            raise
+        except Exception:
+            return  # nothing was created
+        try:
+            await self._delete_node(ip_addr)
+        except Exception as err:
+            self.log.error("Can't deallocate node %s: %s", ip_addr, err)
+
     async def create_node(self):
         async with self.adapter.get_op_semaphore():
             try:
-                ip_addr = await self.adapter.create_node(
-                    log=self.log,
-                    cfg=self.config,
-                    key=await self.get_ssh_key(),
-                    cloud_config=await self.get_cloud_config_data(),
-                )
+                ip_addr = await self._create_cloud_node()
             except Exception as err:
                 raise CloudCreateNodeError(f"Create node error: {err}") from err
 
@@ -169,6 +268,13 @@ class CloudAPI(PCloudAPI[TConfigCloud_contra]):
                 machine = await self.mk_machine(ip_addr)
                 await machine.run("cloud-init status --wait")
                 await machine.setup_node(self.engines)
+            except asyncio.CancelledError:
+                self.log.warning("Setup node %s cancelled - deallocate", ip_addr)
+                try:
+                    await self._delete_node(ip_addr)
+                except Exception as err:
+                    self.log.error("Can't deallocate node %s: %s", ip_addr, err)
+                raise
             except (ProcessError, Exception) as err:
                 if isinstance(err, ProcessError):
                     self.log.error(
@@ -182,12 +288,17 @@ class CloudAPI(PCloudAPI[TConfigCloud_contra]):
                         err.stderr,
                     )
                 self.log.warn("Setup node %s failed - deallocate", ip_addr)
-                await self.delete_node(ip_addr)
+                await self._delete_node(ip_addr)
                 raise CloudSetupNodeError(f"Setup node error: {err}") from err
             return ip_addr
 
+    async def _delete_node(self, host: str):
+        return await self.adapter.delete_node(log=self.log, cfg=self.config, host=host)
+
     async def delete_node(self, host: str):
         async with self.adapter.get_op_semaphore():
-            return await self.adapter.delete_node(
-                log=self.log, cfg=self.config, host=host
-            )
+            return await self._delete_node(host)
+
+    async def close(self) -> None:
+        if self.adapter.close:
+            await self.adapter.close(log=self.log, cfg=self.config)
@@ -3,6 +3,7 @@
 import asyncio
 import logging
 from asyncio.locks import Lock
+from operator import attrgetter
 from pathlib import Path
 from typing import Mapping, Optional, Sequence, Set, Union
 
@@ -15,8 +16,15 @@ from .adapters import azure_adapter, hetzner_adapter, upcloud_adapter
 from .cloud_api import CloudAPI
 from .protocols import CloudCapacity, PCloudAdapter, PCloudAPI, PCloudAPIManager
 
+# how long a capacity snapshot may be reused, seconds
+CAPACITY_CACHE_TTL = 0.5
 
-@define(frozen=True)
+ADAPTERS: Mapping[str, PCloudAdapter] = {
+    x.name: x for x in (azure_adapter, hetzner_adapter, upcloud_adapter)
+}
+
+
+@define
 class CloudAPIManager(PCloudAPIManager):
     """Cloud API manager"""
 
@@ -26,6 +34,20 @@ class CloudAPIManager(PCloudAPIManager):
     on_tasks: Set[int] = field(init=False, factory=set)
     keys_dir: Path = field(factory=Path)
     allocation_lock: Lock = field(factory=Lock, init=False)
+    _capacity: Optional[Mapping[str, CloudCapacity]] = field(init=False, default=None)
+    _capacity_ts: float = field(init=False, default=0.0)
+    _capacity_pending: Optional["asyncio.Task[Mapping[str, CloudCapacity]]"] = field(
+        init=False, default=None
+    )
+    _by_priority: Sequence[PCloudAPI] = field(init=False)
+    _allocations: Set["asyncio.Task[Optional[str]]"] = field(init=False, factory=set)
+
+    @_by_priority.default
+    def _sort_by_priority(self) -> Sequence[PCloudAPI]:
+        "Cloud APIs from the highest priority; stable for equal priorities"
+        return sorted(
+            self.apis.values(), key=attrgetter("config.priority"), reverse=True
+        )
 
     @classmethod
     async def create(
@@ -43,23 +65,17 @@ class CloudAPIManager(PCloudAPIManager):
         else:
             log = logging.getLogger(cls.__name__)
 
-        adapters: Sequence[PCloudAdapter] = [
-            azure_adapter,
-            hetzner_adapter,
-            upcloud_adapter,
-        ]
-        apis: Mapping[str, PCloudAPI] = {}
-
-        def filter_adapters(prefix: str):
-            return filter(lambda x: x.name == prefix, adapters)
-
         ssh_key_lock = asyncio.Lock()
+        pending = []
         for cfg in cloud_configs:
             if cfg.max_nodes <= 0:
                 log.debug("Cloud %s is skipped because of <1 max nodes", cfg.prefix)
                 continue
-            for adapter in filter_adapters(cfg.prefix):
-                apis[adapter.name] = await CloudAPI.create(
+            adapter = ADAPTERS.get(cfg.prefix)
+            if not adapter:
+                continue
+            pending.append(
+                CloudAPI.create(
                     adapter=adapter,
                     config=cfg,
                     local_config=local_config,
@@ -68,6 +84,11 @@ class CloudAPIManager(PCloudAPIManager):
                     ssh_key_lock=ssh_key_lock,
                     log=log,
                 )
+            )
+        # gather keeps the order, so equal priorities still follow the config
+        apis: Mapping[str, PCloudAPI] = {
+            api.name: api for api in await asyncio.gather(*pending)
+        }
         log.info("Active cloud APIs: %s", (", ".join(apis.keys()) or "-"))
 
         return cls(
@@ -80,63 +101,101 @@ class CloudAPIManager(PCloudAPIManager):
     def __bool__(self) -> bool:
         return bool(len(self.apis))
 
+    async def cancel_allocations(self) -> None:
+        "Cancel allocations in progress and wait for them to clean up"
+        if not self._allocations:
+            return
+        self.log.info("Cancelling %s node allocations...", len(self._allocations))
+        allocations = list(self._allocations)
+        for allocation in allocations:
+            allocation.cancel()
+        await asyncio.gather(*allocations, return_exceptions=True)
+
     async def stop(self) -> None:
         self.log.info("Stopping clouds...")
+        await self.cancel_allocations()
+        for api in self.apis.values():
+            try:
+                await api.close()
+            except Exception as err:
+                self.log.warning("Can't close cloud %s: %s", api.name, err)
 
     def mark_task_done(self, on_task: int) -> None:
         self.on_tasks.discard(on_task)
 
-    async def get_capacity(self) -> Mapping[str, CloudCapacity]:
-        data = {}
-        for name, count in (await self.db.count_nodes_clouds()).items():
-            api = self.apis.get("name")
-            data[name] = CloudCapacity(
+    def reset_capacity(self) -> None:
+        "Drop the cached capacity snapshot"
+        self._capacity = None
+        # a query in flight may predate the change, don't share or store it
+        self._capacity_pending = None
+
+    async def load_capacity(self) -> Mapping[str, CloudCapacity]:
+        counts = await self.db.count_nodes_clouds()
+        data = {
+            name: CloudCapacity(
                 name=name,
                 current=count,
-                max=api.config.max_nodes if api else 0,
+                max=self.apis[name].config.max_nodes if name in self.apis else 0,
             )
-
-        for api in self.apis.values():
-            if api.name not in data:
-                data[api.name] = CloudCapacity(
-                    name=api.name, current=0, max=api.config.max_nodes
+            for name, count in counts.items()
+        }
+        for name, api in self.apis.items():
+            if name not in counts:
+                data[name] = CloudCapacity(
+                    name=name, current=0, max=api.config.max_nodes
                 )
         return data
 
+    def _store_capacity(self, task: "asyncio.Task[Mapping[str, CloudCapacity]]"):
+        if task is not self._capacity_pending:
+            return
+        self._capacity_pending = None
+        if not task.cancelled() and task.exception() is None:
+            self._capacity = task.result()
+
+    async def get_capacity(self) -> Mapping[str, CloudCapacity]:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._capacity is not None and now - self._capacity_ts < CAPACITY_CACHE_TTL:
+            return self._capacity
+
+        # concurrent callers share a single query
+        if self._capacity_pending is None:
+            self._capacity_ts = now
+            self._capacity_pending = loop.create_task(self.load_capacity())
+            self._capacity_pending.add_done_callback(self._store_capacity)
+        return await asyncio.shield(self._capacity_pending)
+
     async def select_best_provider(
         self, want_platforms: Optional[Sequence[str]] = None
     ) -> Optional[PCloudAPI]:
         """Select best cloud API"""
-        self.log.debug("Enabled providers: %s", ", ".join(self.apis.keys()))
-        used_providers = []
-        suitable_providers = list(self.apis.keys())
+        if not self.apis:
+            return None
+        debug = self.log.isEnabledFor(logging.DEBUG)
+        if debug:
+            self.log.debug("Enabled providers: %s", ", ".join(self.apis.keys()))
 
         cap = await self.get_capacity()
+        if debug:
+            self.log.debug(
+                "Used providers: %s", [(name, x.current) for name, x in cap.items()]
+            )
 
-        for name, capacity in cap.items():
-            used_providers.append((name, capacity.current))
-            api = self.apis.get(name)
-            if not api:
+        for api in self._by_priority:
+            capacity = cap.get(api.name)
+            # skip maxed out providers
+            if capacity and capacity.current >= api.config.max_nodes:
                 continue
-            # remove maxed out providers
-            if capacity.current >= api.config.max_nodes:
-                suitable_providers.remove(api.name)
-                continue
-            # remove not supported platforms
+            # skip not supported platforms
             if want_platforms:
-                if not any(map(api.is_platform_supported, want_platforms)):
-                    suitable_providers.remove(api.name)
+                if not any(api.is_platform_supported(x) for x in want_platforms):
+                    continue
+            self.log.debug("Chosen: %s", api.name)
+            return api
 
-        self.log.debug("Used providers: %s", used_providers)
-        if not suitable_providers:
-            self.log.debug("No suitable cloud providers")
-            return
-
-        ok_apis = filter(lambda x: x.name in suitable_providers, self.apis.values())
-        ok_apis_sorted = sorted(ok_apis, key=lambda x: x.config.priority, reverse=True)
-        api = ok_apis_sorted[0]
-        self.log.debug("Chosen: %s", api.name)
-        return api
+        self.log.debug("No suitable cloud providers")
+        return None
 
     async def allocate_node(
         self, want_platforms: Optional[Sequence[str]] = None, throttle: bool = False
@@ -146,21 +205,29 @@ class CloudAPIManager(PCloudAPIManager):
             api = await self.select_best_provider(want_platforms)
             if not api:
                 return
-            if throttle and api.get_op_semaphore().locked():
-                self.log.debug(f"Cloud {api.name} is overloaded by requests")
-                await asyncio.sleep(1)
-                return
-
-            tmp_ip = await self.db.add_tmp_node(api.name, api.config.username)
-            await self.db.commit()
+            overloaded = throttle and api.get_op_semaphore().locked()
+            if not overloaded:
+                tmp_ip = await self.db.add_tmp_node(api.name, api.config.username)
+                self.reset_capacity()
+        if overloaded:
+            # back off outside of the lock, so other allocations can proceed
+            self.log.debug("Cloud %s is overloaded by requests", api.name)
+            await asyncio.sleep(1)
+            return
+        await self.db.commit()
         try:
             ip_addr = await api.create_node()
-        finally:
+        except BaseException:
             await self.db.remove_node(tmp_ip)
             await self.db.commit()
+            self.reset_capacity()
+            raise
 
-        await self.db.add_node(ip_addr, api.config.username, None, api.name, True)
+        if not await self.db.replace_tmp_node(tmp_ip, ip_addr, enabled=True):
+            # the placeholder is gone, e.g. removed manually
+            await self.db.add_node(ip_addr, api.config.username, None, api.name, True)
         await self.db.commit()
+        self.reset_capacity()
         return ip_addr
 
     async def allocate(
@@ -169,32 +236,46 @@ class CloudAPIManager(PCloudAPIManager):
         want_platforms: Optional[Sequence[str]] = None,
         throttle: bool = True,
     ) -> Union[str, None]:
-        if on_task in self.on_tasks:
-            return
         if on_task:
+            in_flight = len(self.on_tasks)
             self.on_tasks.add(on_task)
+            if len(self.on_tasks) == in_flight:
+                return  # already allocating for this task
+        allocation = asyncio.ensure_future(
+            self.allocate_node(want_platforms, throttle)
+        )
+        self._allocations.add(allocation)
+        allocation.add_done_callback(self._allocations.discard)
         try:
-            return await self.allocate_node(want_platforms, throttle)
-        except Exception as err:
-            self.log.error(f"Can't allocate node: {err}")
-            if on_task:
-                self.mark_task_done(on_task)
+            # unlike awaiting the task, wait() doesn't raise if it's cancelled
+            await asyncio.wait((allocation,))
+        except asyncio.CancelledError:
+            allocation.cancel()
+            raise
+        if allocation.cancelled():
+            self.log.info("Node allocation cancelled")
+        elif allocation.exception():
+            self.log.error("Can't allocate node: %s", allocation.exception())
+        else:
+            return allocation.result()
+        if on_task:
+            self.mark_task_done(on_task)
         return
 
     async def deallocate(self, ip_addr: str):
-        node = await self.db.get_node(ip_addr)
+        node = await self.db.disable_cloud_node(ip_addr)
         if not node or not node.cloud:
             return
+        await self.db.commit()
         if node.cloud not in self.apis:
             self.log.warning(
-                f"Can't deallocate node {node.ip} - unsupported cloud {node.cloud}"
+                "Can't deallocate node %s - unsupported cloud %s", node.ip, node.cloud
             )
-        await self.db.disable_node(ip_addr)
-        await self.db.commit()
         try:
             await self.apis[node.cloud].delete_node(node.ip)
         except Exception as err:
-            self.log.error(f"Can't deallocate node {node.ip}: {err}")
+            self.log.error("Can't deallocate node %s: %s", node.ip, err)
             return False
         await self.db.remove_node(node.ip)
         await self.db.commit()
+        self.reset_capacity()
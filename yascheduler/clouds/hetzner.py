@@ -3,8 +3,8 @@
 import asyncio
 import logging
 from concurrent.futures.thread import ThreadPoolExecutor
-from functools import lru_cache, partial
-from typing import Optional
+from functools import partial
+from typing import Dict, Optional, Tuple
 
 from asyncssh.public_key import SSHKey as ASSHKey
 from hcloud import APIException
@@ -16,22 +16,40 @@ from hcloud.ssh_keys.domain import SSHKey as HSSHKey
 
 from ..config import ConfigCloudHetzner
 from .protocols import PCloudConfig
-from .utils import get_key_name, get_rnd_name
+from .utils import ServersIndex, get_key_name, get_public_key, get_rnd_name
 
 executor = ThreadPoolExecutor(max_workers=5)
 
+_servers: ServersIndex[BoundServer] = ServersIndex(
+    list_servers=lambda client: client.servers.get_all(),
+    get_ip=lambda server: server.public_net.ipv4.ip,
+)
+
+_clients: Dict[str, HClient] = {}
+_ssh_key_ids: Dict[Tuple[HClient, str], int] = {}
+
 
-@lru_cache(maxsize=None)
 def get_client(cfg: ConfigCloudHetzner) -> HClient:
-    "Get Hetzner client"
-    return HClient(cfg.token)
+    "Get Hetzner client (one per API token)"
+    client = _clients.get(cfg.token)
+    if client is None:
+        client = _clients[cfg.token] = HClient(cfg.token)
+    return client
 
 
-@lru_cache
 def get_ssh_key_id(client: HClient, key: ASSHKey) -> int:
-    "Get Hetzner ssh id"
+    "Get Hetzner ssh id (cached)"
+    cache_key = (client, key.get_fingerprint())
+    key_id = _ssh_key_ids.get(cache_key)
+    if key_id is None:
+        key_id = _ssh_key_ids[cache_key] = find_or_create_ssh_key(client, key)
+    return key_id
+
+
+def find_or_create_ssh_key(client: HClient, key: ASSHKey) -> int:
+    "Upload ssh key to Hetzner or find the uploaded one"
     key_name = get_key_name(key)
-    pub_key = key.export_public_key("openssh").decode("utf-8")
+    pub_key = get_public_key(key)
 
     try:
         return client.ssh_keys.create(name=key_name, public_key=pub_key).id
@@ -42,11 +60,6 @@ def get_ssh_key_id(client: HClient, key: ASSHKey) -> int:
             ) or client.ssh_keys.get_by_name(key_name)
             if hkey:
                 return hkey.id
-            prefix = "yakey"
-            name_len = len(get_rnd_name(prefix))
-            for hkey in client.ssh_keys.get_all():
-                if hkey.name.startswith(prefix) and len(hkey.name) == name_len:
-                    return hkey.id
         raise err
 
 
@@ -76,14 +89,6 @@ async def hetzner_create_node(
     return ip_addr
 
 
-def find_srv(client: HClient, host: str) -> Optional[BoundServer]:
-    """Find BoundServer by IP addr"""
-    for server in client.servers.get_all():
-        if server.public_net.ipv4.ip == host:
-            return client.servers.get_by_id(server.id)
-    return None
-
-
 async def hetzner_delete_node(
     log: logging.Logger,
     cfg: ConfigCloudHetzner,
@@ -92,10 +97,16 @@ async def hetzner_delete_node(
     """Delete node"""
     loop = asyncio.get_running_loop()
     client = await loop.run_in_executor(executor, get_client, cfg)
-    server = await loop.run_in_executor(executor, find_srv, client, host)
+    server = await loop.run_in_executor(executor, _servers.find, client, host)
 
     if server:
-        await loop.run_in_executor(executor, server.delete)
+        try:
+            await loop.run_in_executor(executor, server.delete)
+        except APIException:
+            # the cached server may be gone already, list again next time
+            _servers.forget(client)
+            raise
+        _servers.forget(client, host)
         log.info("DELETED %s", host)
 
     else:
@@ -63,6 +63,18 @@ class DeleteNodeCallable(Protocol[TConfigCloud_contra]):
         raise NotImplementedError
 
 
+class CloseCallable(Protocol[TConfigCloud_contra]):
+    "Release cloud client resources protocol"
+
+    @abstractmethod
+    async def __call__(
+        self,
+        log: logging.Logger,
+        cfg: TConfigCloud_contra,
+    ) -> None:
+        raise NotImplementedError
+
+
 class PCloudAdapter(Protocol[TConfigCloud_contra]):
     "Cloud adapter protocol"
     name: str
@@ -71,6 +83,7 @@ class PCloudAdapter(Protocol[TConfigCloud_contra]):
     create_node_conn_timeout: int
     create_node_timeout: int
     delete_node: DeleteNodeCallable[TConfigCloud_contra]
+    close: Optional[CloseCallable[TConfigCloud_contra]]
     op_limit: int
 
     @classmethod
@@ -84,6 +97,7 @@ class PCloudAdapter(Protocol[TConfigCloud_contra]):
         create_node_conn_timeout: Optional[int],
         create_node_timeout: Optional[int],
         op_limit: int = 1,
+        close: Optional[CloseCallable[TConfigCloud_contra]] = None,
     ) -> Self:
         "Create adapter"
         raise NotImplementedError
@@ -151,6 +165,11 @@ class PCloudAPI(Protocol[TConfigCloud_contra]):
         "Delete node"
         raise NotImplementedError
 
+    @abstractmethod
+    async def close(self) -> None:
+        "Release cloud client resources"
+        raise NotImplementedError
+
 
 @define(frozen=True)
 class CloudCapacity:
@@ -185,6 +204,11 @@ class PCloudAPIManager(Protocol):
     def __bool__(self) -> bool:
         raise NotImplementedError
 
+    @abstractmethod
+    async def cancel_allocations(self) -> None:
+        "Cancel node allocations in progress"
+        raise NotImplementedError
+
     @abstractmethod
     async def stop(self) -> None:
         "Stop cloud api manager"
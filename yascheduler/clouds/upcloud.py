@@ -2,26 +2,50 @@
 
 import asyncio
 import logging
-import time
+import threading
 from concurrent.futures.thread import ThreadPoolExecutor
-from functools import lru_cache
-from typing import Optional
+from typing import Dict, Optional
 
+import backoff
 from asyncssh.public_key import SSHKey
 from upcloud_api import CloudManager, Server, Storage, login_user_block
 
 from ..config import ConfigCloudUpcloud
 from .protocols import PCloudConfig
-from .utils import get_rnd_name
+from .utils import ServersIndex, get_public_key, get_rnd_name
 
-executor = ThreadPoolExecutor(max_workers=5)
+# operations are limited by the adapter's semaphore, no need for spare threads
+OP_LIMIT = 1
+executor = ThreadPoolExecutor(max_workers=OP_LIMIT)
+
+# seconds to let a stopped server shut down before destroying it
+STOP_WAIT = 20
+DESTROY_ATTEMPTS = 10
+
+_servers: ServersIndex[Server] = ServersIndex(
+    list_servers=lambda client: client.get_servers(),
+    get_ip=lambda server: server.get_public_ip(),
+)
+
+_clients: Dict[ConfigCloudUpcloud, CloudManager] = {}
+_clients_locks: Dict[ConfigCloudUpcloud, threading.Lock] = {}
+_clients_locks_lock = threading.Lock()
 
 
-@lru_cache(maxsize=None)
 def get_client(cfg: ConfigCloudUpcloud) -> CloudManager:
-    """Get Upcloud client"""
-    client = CloudManager(cfg.login, cfg.password)
-    client.authenticate()
+    """Get Upcloud client (authenticated once per config)"""
+    client = _clients.get(cfg)
+    if client is None:
+        with _clients_locks_lock:
+            lock = _clients_locks.setdefault(cfg, threading.Lock())
+        # executor threads must not authenticate the same account concurrently,
+        # other accounts don't wait for it
+        with lock:
+            client = _clients.get(cfg)
+            if client is None:
+                client = CloudManager(cfg.login, cfg.password)
+                client.authenticate()
+                _clients[cfg] = client
     return client
 
 
@@ -36,7 +60,7 @@ def upcloud_create_node_sync(
 
     login_user = login_user_block(
         username=cfg.username,
-        ssh_keys=[key.export_public_key("openssh").decode("utf-8")],
+        ssh_keys=[get_public_key(key)],
         create_password=False,
     )
     server = client.create_server(
@@ -67,31 +91,12 @@ async def upcloud_create_node(
     )
 
 
-def upcload_delete_node_sync(
-    log: logging.Logger,
-    cfg: ConfigCloudUpcloud,
-    host: str,
-):
-    """Delete node"""
-    client = get_client(cfg)
-    for server in client.get_servers():
-        if server.get_public_ip() == host:
-            server.stop()
-            log.info("WAITING FOR STOP...")
-            time.sleep(20)
-            while True:
-                try:
-                    server.destroy()
-                except Exception:
-                    time.sleep(5)
-                else:
-                    break
-            for storage in server.storage_devices:
-                storage.destroy()
-            log.info("DELETED %s", host)
-            break
-    else:
-        log.info("NODE %s NOT DELETED AS UNKNOWN", host)
+@backoff.on_exception(
+    backoff.expo, Exception, max_tries=DESTROY_ATTEMPTS, max_value=30
+)
+async def destroy_server(server: Server) -> None:
+    """Destroy the server, retrying while it's still stopping"""
+    await asyncio.get_running_loop().run_in_executor(executor, server.destroy)
 
 
 async def upcload_delete_node(
@@ -100,6 +105,24 @@ async def upcload_delete_node(
     host: str,
 ):
     """Delete node"""
-    return await asyncio.get_running_loop().run_in_executor(
-        executor, upcload_delete_node_sync, log, cfg, host
-    )
+    loop = asyncio.get_running_loop()
+    client = await loop.run_in_executor(executor, get_client, cfg)
+    server = await loop.run_in_executor(executor, _servers.find, client, host)
+    if not server:
+        log.info("NODE %s NOT DELETED AS UNKNOWN", host)
+        return
+
+    try:
+        await loop.run_in_executor(executor, server.stop)
+    except Exception:
+        # the cached server may be gone already, list again next time
+        _servers.forget(client)
+        raise
+    _servers.forget(client, host)
+    log.info("WAITING FOR STOP...")
+    # don't hold an executor thread while the server shuts down
+    await asyncio.sleep(STOP_WAIT)
+    await destroy_server(server)
+    for storage in server.storage_devices:
+        await loop.run_in_executor(executor, storage.destroy)
+    log.info("DELETED %s", host)
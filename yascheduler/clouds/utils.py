@@ -2,28 +2,78 @@
 
 import random
 import string
+import threading
+import time
+from functools import lru_cache
 from pathlib import PurePath
-from typing import TypeVar
+from typing import Callable, Dict, Generic, Hashable, Iterable, Optional, Tuple, TypeVar
 
 from asyncssh.public_key import SSHKey
+from attrs import define, field
 
 T = TypeVar("T")
 
+# how long a listing of servers may be reused for lookups by IP, seconds
+SERVERS_INDEX_TTL = 30
+
 
 def get_rnd_name(prefix: str) -> str:
     """Create random string with prefix"""
-    return (
-        prefix
-        + "-"
-        + "".join([random.choice(string.ascii_lowercase) for _ in range(8)])
-    )
+    return f"{prefix}-{''.join(random.choices(string.ascii_lowercase, k=8))}"
 
 
+@lru_cache(maxsize=16)
 def get_key_name(key: SSHKey) -> str:
-    """Get SSHKey's name"""
+    """Get SSHKey's name (cached, clouds reuse the same key object)"""
     fname_opt = key.get_filename()
     key_filename = fname_opt.decode("utf-8") if fname_opt else None
     if key_filename:
         key_filename = PurePath(key_filename).name
     key_fingerprint = key.get_fingerprint("md5").split(":", maxsplit=1)[1]
     return key_filename or key.get_comment() or key_fingerprint
+
+
+@lru_cache(maxsize=16)
+def get_public_key(key: SSHKey) -> str:
+    """Get SSHKey's public key in OpenSSH format (cached)"""
+    return key.export_public_key("openssh").decode("utf-8")
+
+
+@define
+class ServersIndex(Generic[T]):
+    """Cloud servers by IP addr, a listing is reused for lookups for a while"""
+
+    list_servers: Callable[[Hashable], Iterable[T]] = field()
+    get_ip: Callable[[T], str] = field()
+    ttl: float = field(default=SERVERS_INDEX_TTL)
+    _indexes: Dict[Hashable, Tuple[float, Dict[str, T]]] = field(
+        init=False, factory=dict
+    )
+    _lock: threading.Lock = field(init=False, factory=threading.Lock)
+
+    def refresh(self, client: Hashable) -> Dict[str, T]:
+        """List all servers of the client by IP addr"""
+        index = {self.get_ip(x): x for x in self.list_servers(client)}
+        self._indexes[client] = (time.monotonic(), index)
+        return index
+
+    def find(self, client: Hashable, host: str) -> Optional[T]:
+        """Find server by IP addr"""
+        created, index = self._indexes.get(client, (0.0, {}))
+        if time.monotonic() - created < self.ttl and host in index:
+            return index[host]
+        # unknown or stale - the server may be newer than the listing;
+        # executor threads looking up at once share a single listing
+        with self._lock:
+            listed, index = self._indexes.get(client, (0.0, {}))
+            if listed <= created or time.monotonic() - listed >= self.ttl:
+                index = self.refresh(client)
+        return index.get(host)
+
+    def forget(self, client: Hashable, host: Optional[str] = None) -> None:
+        """Drop the server (or all servers) from the index"""
+        if host is None:
+            self._indexes.pop(client, None)
+            return
+        _, index = self._indexes.get(client, (0.0, {}))
+        index.pop(host, None)
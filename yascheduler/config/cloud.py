@@ -2,13 +2,19 @@
 """Cloud configurations"""
 
 from configparser import SectionProxy
-from functools import partial
-from typing import Optional, Sequence, Union
+from itertools import chain
+from typing import FrozenSet, Optional, Sequence, Union
 
 from attrs import define, field, fields, validators
 from typing_extensions import Self
 
-from .utils import _make_default_field, opt_str_val, warn_unknown_fields
+from .utils import (
+    _make_default_field,
+    get_prefixed_options,
+    opt_int,
+    opt_str_val,
+    warn_unknown_fields,
+)
 
 
 def _check_az_user(_: "ConfigCloudAzure", __, value: str):
@@ -16,10 +22,6 @@ def _check_az_user(_: "ConfigCloudAzure", __, value: str):
         raise ValueError("Root user is forbidden on Azure")
 
 
-def _fmt_key(prefix: str, name: str):
-    return f"{prefix}_{name}"
-
-
 @define(frozen=True)
 class AzureImageReference:
     """Azure's image reference"""
@@ -81,40 +83,33 @@ class ConfigCloudAzure:
     def from_config_parser_section(cls, sec: SectionProxy) -> "ConfigCloudAzure":
         "Create config from config parser's section"
 
-        fmt = partial(_fmt_key, cls.prefix)
+        opts = get_prefixed_options(sec, cls.prefix)
 
-        warn_unknown_fields(
-            [
-                *cls.get_valid_config_parser_fields(),
-                *ConfigCloudHetzner.get_valid_config_parser_fields(),
-                *ConfigCloudUpcloud.get_valid_config_parser_fields(),
-            ],
-            sec,
-        )
+        warn_unknown_fields(ALL_CLOUD_KEYS, sec)
 
-        vm_image = sec.get(fmt("image"))
+        vm_image = opts.get("image")
         image_ref = None
         if vm_image:
             image_ref = AzureImageReference.from_urn(vm_image)
 
         return cls(
-            tenant_id=sec.get(fmt("tenant_id")),
-            client_id=sec.get(fmt("client_id")),
-            client_secret=sec.get(fmt("client_secret")),
-            subscription_id=sec.get(fmt("subscription_id")),
-            resource_group=sec.get(fmt("resource_group")),
-            location=sec.get(fmt("location")),
-            vnet=sec.get(fmt("vnet")),
-            subnet=sec.get(fmt("subnet")),
-            nsg=sec.get(fmt("nsg")),
+            tenant_id=opts.get("tenant_id"),
+            client_id=opts.get("client_id"),
+            client_secret=opts.get("client_secret"),
+            subscription_id=opts.get("subscription_id"),
+            resource_group=opts.get("resource_group"),
+            location=opts.get("location"),
+            vnet=opts.get("vnet"),
+            subnet=opts.get("subnet"),
+            nsg=opts.get("nsg"),
             vm_image=image_ref or AzureImageReference(),
-            vm_size=sec.get(fmt("size")),
-            max_nodes=sec.getint(fmt("max_nodes")),
-            username=sec.get(fmt("user")),
-            priority=sec.getint(fmt("priority")),
-            idle_tolerance=sec.getint(fmt("idle_tolerance")),
-            jump_username=sec.get(fmt("jump_user"), None),
-            jump_host=sec.get(fmt("jump_host"), None),
+            vm_size=opts.get("size"),
+            max_nodes=opt_int(opts.get("max_nodes")),
+            username=opts.get("user"),
+            priority=opt_int(opts.get("priority")),
+            idle_tolerance=opt_int(opts.get("idle_tolerance")),
+            jump_username=opts.get("jump_user"),
+            jump_host=opts.get("jump_host"),
         )
 
 
@@ -147,27 +142,20 @@ class ConfigCloudHetzner:
     @classmethod
     def from_config_parser_section(cls, sec: SectionProxy) -> "ConfigCloudHetzner":
         "Create config from config parser's section"
-        fmt = partial(_fmt_key, cls.prefix)
-
-        warn_unknown_fields(
-            [
-                *ConfigCloudAzure.get_valid_config_parser_fields(),
-                *cls.get_valid_config_parser_fields(),
-                *ConfigCloudUpcloud.get_valid_config_parser_fields(),
-            ],
-            sec,
-        )
+        opts = get_prefixed_options(sec, cls.prefix)
+
+        warn_unknown_fields(ALL_CLOUD_KEYS, sec)
 
         return cls(
-            token=sec.get(fmt("token")),
-            max_nodes=sec.getint(fmt("max_nodes")),
-            username=sec.get(fmt("user")),
-            server_type=sec.get(fmt("server_type")),
-            image_name=sec.get(fmt("image_name")),
-            priority=sec.getint(fmt("priority")),
-            idle_tolerance=sec.getint(fmt("idle_tolerance")),
-            jump_username=sec.get(fmt("jump_user"), None),
-            jump_host=sec.get(fmt("jump_host"), None),
+            token=opts.get("token"),
+            max_nodes=opt_int(opts.get("max_nodes")),
+            username=opts.get("user"),
+            server_type=opts.get("server_type"),
+            image_name=opts.get("image_name"),
+            priority=opt_int(opts.get("priority")),
+            idle_tolerance=opt_int(opts.get("idle_tolerance")),
+            jump_username=opts.get("jump_user"),
+            jump_host=opts.get("jump_host"),
         )
 
 
@@ -199,27 +187,28 @@ class ConfigCloudUpcloud:
     @classmethod
     def from_config_parser_section(cls, sec: SectionProxy) -> "ConfigCloudUpcloud":
         "Create config from config parser's section"
-        fmt = partial(_fmt_key, cls.prefix)
-
-        warn_unknown_fields(
-            [
-                *ConfigCloudAzure.get_valid_config_parser_fields(),
-                *ConfigCloudHetzner.get_valid_config_parser_fields(),
-                *cls.get_valid_config_parser_fields(),
-            ],
-            sec,
-        )
+        opts = get_prefixed_options(sec, cls.prefix)
+
+        warn_unknown_fields(ALL_CLOUD_KEYS, sec)
 
         return cls(
-            login=sec.get(fmt("login")),
-            password=sec.get(fmt("password")),
-            max_nodes=sec.getint(fmt("max_nodes")),
-            username=sec.get(fmt("user")),
-            priority=sec.getint(fmt("priority")),
-            idle_tolerance=sec.getint(fmt("idle_tolerance")),
-            jump_username=sec.get(fmt("jump_user"), None),
-            jump_host=sec.get(fmt("jump_host"), None),
+            login=opts.get("login"),
+            password=opts.get("password"),
+            max_nodes=opt_int(opts.get("max_nodes")),
+            username=opts.get("user"),
+            priority=opt_int(opts.get("priority")),
+            idle_tolerance=opt_int(opts.get("idle_tolerance")),
+            jump_username=opts.get("jump_user"),
+            jump_host=opts.get("jump_host"),
         )
 
 
 ConfigCloud = Union[ConfigCloudAzure, ConfigCloudHetzner, ConfigCloudUpcloud]
+
+# valid keys of the clouds section, computed once at import
+ALL_CLOUD_KEYS: FrozenSet[str] = frozenset(
+    chain.from_iterable(
+        x.get_valid_config_parser_fields()
+        for x in (ConfigCloudAzure, ConfigCloudHetzner, ConfigCloudUpcloud)
+    )
+)
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 """Main config module"""
 
+import os
 from configparser import ConfigParser
 from pathlib import PurePath
-from typing import Sequence, Union
+from typing import Dict, Hashable, Optional, Sequence, Tuple, Union
 
 from attrs import define, field, validators
 
@@ -13,6 +14,24 @@ from .engine_repository import EngineRepository
 from .local import ConfigLocal
 from .remote import ConfigRemote
 
+ConfigPath = Union[str, bytes, PurePath]
+
+# parsed configs by absolute path, see Config.from_config_parser;
+# cached instances are shared, so Config must stay immutable all the way down
+_CONFIG_CACHE: Dict[str, Tuple[Hashable, "Config"]] = {}
+
+
+def _get_file_stamp(path: str) -> Hashable:
+    "Config file identity: modification time, size and working directory"
+    stat: Optional[Tuple[int, int]] = None
+    try:
+        st = os.stat(path)
+        stat = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        pass
+    # relative paths in the config are resolved against working directory
+    return (stat, os.getcwd())
+
 
 @define(frozen=True)
 class Config:
@@ -27,8 +46,24 @@ class Config:
     )
 
     @classmethod
-    def from_config_parser(cls, files: Union[str, bytes, PurePath]) -> "Config":
-        "Create Config from path or config file contents"
+    def from_config_parser(cls, files: ConfigPath) -> "Config":
+        "Create Config from config file path, cached until the file changes"
+        path = os.path.abspath(os.fsdecode(files))
+        stamp = _get_file_stamp(path)
+        cached = _CONFIG_CACHE.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        cfg = cls._parse(files)
+        _CONFIG_CACHE[path] = (stamp, cfg)
+        return cfg
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        "Forget parsed configs"
+        _CONFIG_CACHE.clear()
+
+    @classmethod
+    def _parse(cls, files: ConfigPath) -> "Config":
         config = ConfigParser()
         config.read(files)
 
@@ -39,23 +74,28 @@ class Config:
         local = ConfigLocal.from_config_parser_section(config["local"])
         remote = ConfigRemote.from_config_parser_section(config["remote"])
 
-        # config prefixes
-        cloud_prefixes = set(map(lambda x: x.split("_")[0], config.options("clouds")))
-        # inherit username
-        for prefix in cloud_prefixes:
-            key = f"{prefix}_user"
-            if key not in config.options("clouds"):
-                config["clouds"][key] = remote.username
+        clouds_options = set(config.options("clouds"))
         # available cloud config models
         cloud_variants = (
             ConfigCloudAzure,
             ConfigCloudHetzner,
             ConfigCloudUpcloud,
         )
-        # intersection
-        cloud_variants_match = filter(
-            lambda x: x.prefix in cloud_prefixes, cloud_variants
-        )
+        cloud_prefixes = tuple(f"{x.prefix}_" for x in cloud_variants)
+        # configured clouds, matched against the known prefixes
+        used_prefixes = {
+            opt[: opt.index("_") + 1]
+            for opt in clouds_options
+            if opt.startswith(cloud_prefixes)
+        }
+        cloud_variants_match = [
+            x for x, p in zip(cloud_variants, cloud_prefixes) if p in used_prefixes
+        ]
+        # inherit username
+        for variant in cloud_variants_match:
+            key = f"{variant.prefix}_user"
+            if key not in clouds_options:
+                config["clouds"][key] = remote.username
         # instantiate
         clouds = map(
             lambda x: x.from_config_parser_section(config["clouds"]),
@@ -66,6 +106,6 @@ class Config:
             db=ConfigDb.from_config_parser_section(config["db"]),
             local=local,
             remote=remote,
-            clouds=list(clouds),
+            clouds=tuple(clouds),
             engines=EngineRepository.from_config_parser(config, local.engines_dir),
         )
@@ -6,6 +6,7 @@ from collections import UserDict
 from configparser import ConfigParser
 from itertools import chain
 from pathlib import PurePath
+from types import MappingProxyType
 from typing import Any, Callable, Mapping, Sequence
 
 from attrs import Attribute, asdict, define, field, validators
@@ -15,19 +16,27 @@ from .engine import Engine
 
 
 def _value_serializer(_: type, __: Attribute, value: Any) -> Any:
-    "Serialize PurePath as string"
+    "Serialize PurePath as string and read-only mapping as dict"
     if isinstance(value, PurePath):
         return str(value)
+    if isinstance(value, MappingProxyType):
+        return dict(value)
     return value
 
 
-@define
+def _read_only(data: Mapping[str, Engine]) -> Mapping[str, Engine]:
+    "Read-only copy of the mapping"
+    return MappingProxyType(dict(data))
+
+
+@define(frozen=True)
 class EngineRepository(UserDict, Mapping[str, Engine]):
     """Repository of Engines"""
 
     engines_dir: PurePath = field()
     data: Mapping[str, Engine] = field(
         factory=dict,
+        converter=_read_only,
         validator=[
             validators.deep_mapping(
                 key_validator=validators.instance_of(str),
@@ -3,7 +3,7 @@
 
 import warnings
 from configparser import SectionProxy
-from typing import Optional, Sequence
+from typing import Dict, Iterable, Optional, Sequence
 
 from attrs import converters, field, validators
 
@@ -22,8 +22,20 @@ def _make_default_field(default, extra_validators: Optional[Sequence] = None):
     )
 
 
-def warn_unknown_fields(known_fields: Sequence[str], sec: SectionProxy) -> None:
-    unknown_fields = list(set(sec.keys()) - set(known_fields))
+def get_prefixed_options(sec: SectionProxy, prefix: str) -> Dict[str, str]:
+    "Returns section options with the prefix stripped, in a single section walk"
+    start = len(prefix) + 1
+    prefix = f"{prefix}_"
+    return {k[start:]: v for k, v in sec.items() if k.startswith(prefix)}
+
+
+def opt_int(value: Optional[str]) -> Optional[int]:
+    "Convert optional string to integer"
+    return None if value is None else int(value)
+
+
+def warn_unknown_fields(known_fields: Iterable[str], sec: SectionProxy) -> None:
+    unknown_fields = list(set(sec.keys()).difference(known_fields))
     if unknown_fields:
         warnings.warn(
             f"Config section {sec.name} unknown fields: {', '.join(unknown_fields)}",
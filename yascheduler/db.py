@@ -209,6 +209,20 @@ class DB:
             ip_addr, ncpus, enabled=enabled, cloud=cloud, username=username
         )
 
+    async def replace_tmp_node(
+        self, tmp_ip: str, ip_addr: str, enabled: bool = False
+    ) -> bool:
+        """Turn temporary node into the real one. Returns False if it's missing"""
+        rows = await self.run(
+            """UPDATE yascheduler_nodes SET ip=:ip, enabled=:enabled
+            WHERE ip=:tmp_ip
+            RETURNING ip;""",
+            tmp_ip=tmp_ip,
+            ip=ip_addr,
+            enabled=enabled,
+        )
+        return bool(rows)
+
     async def enable_node(self, ip_addr: str) -> None:
         """Enable node"""
         await self.run(
@@ -223,6 +237,17 @@ class DB:
             ip=ip_addr,
         )
 
+    async def disable_cloud_node(self, ip_addr: str) -> Optional[NodeModel]:
+        """Disable cloud node and return it, if any"""
+        rows = await self.run(
+            """UPDATE yascheduler_nodes SET enabled=FALSE
+            WHERE ip=:ip AND cloud IS NOT NULL
+            RETURNING ip, ncpus, enabled, cloud, username;""",
+            ip=ip_addr,
+        )
+        for row in rows or []:
+            return NodeModel(*row)
+
     async def remove_node(self, ip_addr: str) -> None:
         """Remove node"""
         await self.run("DELETE FROM yascheduler_nodes WHERE ip=:ip;", ip=ip_addr)
@@ -254,7 +279,7 @@ class DB:
         rows = await self.run(
             """SELECT task_id, label, ip, status, metadata
             FROM yascheduler_tasks
-            WHERE task_id IN (SELECT unnest(CAST (:task_ids AS int[]))) ORDER BY task_id;""",
+            WHERE task_id = ANY(CAST(:task_ids AS int[])) ORDER BY task_id;""",
             task_ids=jobs,
         )
         return [TaskModel(*x) for x in (rows or [])]
@@ -266,7 +291,7 @@ class DB:
         rows = await self.run(
             """SELECT task_id, label, ip, status, metadata
             FROM yascheduler_tasks
-            WHERE status IN (SELECT unnest(CAST (:statuses AS int[]))) ORDER BY task_id
+            WHERE status = ANY(CAST(:statuses AS int[])) ORDER BY task_id
             LIMIT :lim;""",
             statuses=[x.value for x in statuses],
             lim=limit,
@@ -282,7 +307,7 @@ class DB:
             FROM yascheduler_tasks AS t
             JOIN yascheduler_nodes AS n ON n.ip=t.ip
             WHERE status=:status AND
-            task_id IN (SELECT unnest(CAST (:ids AS int[]))) ORDER BY task_id;""",
+            task_id = ANY(CAST(:ids AS int[])) ORDER BY task_id;""",
             ids=ids,
             status=status.value,
         )
@@ -22,15 +22,22 @@ class UniqueQueue(asyncio.Queue, Generic[TUMsgId, TUMsgPayload]):
 
     name: str
     _queue: Deque[UMessage[TUMsgId, TUMsgPayload]]
+    _queued: Set[UMessage[TUMsgId, TUMsgPayload]]
     _done_pending: Set[UMessage[TUMsgId, TUMsgPayload]]
 
     def __init__(self, name: str, *argv, maxsize: int = 0, **kwargs):
         self.name = name
+        self._queued = set()
         self._done_pending = set()
         super().__init__(maxsize, *argv, **kwargs)
 
+    def _put(self, item):
+        self._queued.add(item)
+        self._queue.append(item)
+
     def _get(self):
         item = self._queue.popleft()
+        self._queued.discard(item)
         self._done_pending.add(item)
         return item
 
@@ -39,7 +46,7 @@ class UniqueQueue(asyncio.Queue, Generic[TUMsgId, TUMsgPayload]):
 
     async def put(self, item: UMessage[TUMsgId, TUMsgPayload]) -> None:
         # skip already added
-        if item in self._queue or item in self._done_pending:
+        if item in self._queued or item in self._done_pending:
             return
         await super().put(item)
 
@@ -69,17 +69,16 @@ class RemoteMachineRepository(UserDict, MutableMapping[str, PRemoteMachine]):
         if busy is False:
             checks.append(lambda x: not x.meta.busy)
         if platforms:
-            checks.append(lambda x: bool(set(platforms) & set(x.platforms)))
+            wanted = frozenset(platforms)
+            checks.append(lambda x: not wanted.isdisjoint(x.platforms))
         if free_since_gt:
             checks.append(lambda x: x.meta.is_free_longer_than(free_since_gt))
 
+        # filter first, so only the matching machines are sorted
+        selected = [
+            (ip, m) for ip, m in self.data.items() if all(x(m) for x in checks)
+        ]
         return evolve(
             self,
-            data={
-                ip: m
-                for ip, m in sorted(
-                    self.data.items(), key=itemgetter(1), reverse=reverse_sort
-                )
-                if all([x(m) for x in checks])
-            },
+            data=dict(sorted(selected, key=itemgetter(1), reverse=reverse_sort)),
         )
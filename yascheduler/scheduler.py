@@ -7,6 +7,7 @@ from collections import Counter
 from datetime import datetime, timedelta
 from functools import partial
 from pathlib import Path, PurePath, PurePosixPath
+from time import monotonic
 from typing import (
     Any,
     AsyncGenerator,
@@ -134,10 +135,8 @@ class Scheduler:
     async def clouds_get_capacity(self) -> int:
         "Get capacity of all clouds"
         ccap = await self.clouds.get_capacity()
-        n_busy_cloud_nodes = sum(x.current for x in ccap.values())
-        max_nodes = sum(x.config.max_nodes for x in self.clouds.apis.values())
-        diff = max_nodes - n_busy_cloud_nodes
-        return max(0, diff)
+        # the snapshot covers every configured cloud, with its max nodes
+        return max(0, sum(x.max - x.current for x in ccap.values()))
 
     async def do_task_webhook(
         self, task_id: int, metadata: Mapping[str, Any], status: TaskStatus
@@ -288,7 +287,7 @@ class Scheduler:
 
     async def allocate_task(self, task: TaskModel) -> bool:
         "Allocate task to a free remote machine or ask allocation of new cloud machine"
-        self.log.debug(f"Allocating task {task.task_id}")
+        self.log.debug("Allocating task %s", task.task_id)
         engine_name: Optional[str] = task.metadata.get("engine", None)
         engine: Optional[Engine] = self.config.engines.get(engine_name)
         if engine is None:
@@ -314,15 +313,16 @@ class Scheduler:
             if ip not in busy_node_ips
         }
         if free_machines:
-            self.log.debug(
-                "Free machines with platform match: %s"
-                % ", ".join(free_machines.keys())
-            )
+            if self.log.isEnabledFor(logging.DEBUG):
+                self.log.debug(
+                    "Free machines with platform match: %s",
+                    ", ".join(free_machines.keys()),
+                )
         for ip, machine in free_machines.items():
             task_m = evolve(task, ip=ip)
-            self.log.debug(f"Allocate task {task.task_id} to machine {ip}")
+            self.log.debug("Allocate task %s to machine %s", task.task_id, ip)
             if await self.start_task_on_machine(machine, engine, task_m):
-                self.log.debug(f"Task {task.task_id} allocated to machine {ip}")
+                self.log.debug("Task %s allocated to machine %s", task.task_id, ip)
                 await machine.start_occupancy_check(engine)
                 await self.db.set_task_running(task.task_id, task_m.ip)
                 await self.db.commit()
@@ -416,7 +416,7 @@ class Scheduler:
     async def print_stats(self):
         "Print usage statistics to the log"
         while not self.cancellation_event.is_set():
-            end_time = datetime.now() + timedelta(seconds=10)
+            end_time = monotonic() + 10
             ncounters = await self.db.count_nodes_by_status()
             tcounters = await self.db.count_tasks_by_status()
             tmpl = (
@@ -605,7 +605,7 @@ class Scheduler:
 
         try:
             while not self.cancellation_event.is_set():
-                end_time = datetime.now() + timedelta(seconds=self.sleep_interval)
+                end_time = monotonic() + self.sleep_interval
                 try:
                     async for msg in producer():
                         await queue.put(msg)
@@ -681,6 +681,8 @@ class Scheduler:
     async def stop(self):
         self.log.info("Stopping...")
         self.cancellation_event.set()
+        # don't let allocate workers wait for nodes that won't be used
+        await self.clouds.cancel_allocations()
 
         for task in self.bg_jobs:
             task.cancel()
@@ -1,21 +1,20 @@
 """Time utils"""
 
 import asyncio
-from datetime import datetime
-from time import sleep
+from time import monotonic, sleep
 
 
-def sleep_until(end: datetime) -> None:
-    "Sleep until :end:"
-    now = datetime.now()
-    if now >= end:
+def sleep_until(end: float) -> None:
+    "Sleep until :end: - a deadline on the time.monotonic() clock"
+    delay = end - monotonic()
+    if delay <= 0:
         return
-    sleep((end - now).total_seconds())
+    sleep(delay)
 
 
-async def asleep_until(end: datetime) -> None:
-    "Sleep until :end:"
-    now = datetime.now()
-    if now >= end:
+async def asleep_until(end: float) -> None:
+    "Sleep until :end: - a deadline on the time.monotonic() clock"
+    delay = end - monotonic()
+    if delay <= 0:
         return
-    await asyncio.sleep((end - now).total_seconds())
+    await asyncio.sleep(delay)
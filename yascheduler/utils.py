@@ -492,4 +492,12 @@ def daemonize(log_file=None):
 
         await yac.start()
 
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        # uvloop.install() is deprecated since uvloop 0.18 on Python 3.12+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
     asyncio.run(run())